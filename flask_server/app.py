@@ -1,25 +1,24 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 import os
-import pickle
 import json
-import pandas as pd
-import numpy as np
-from typing import Dict, List, Any
-import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional, Tuple
 
 import firebase_admin
 from firebase_admin import credentials, firestore
-from openai import OpenAI
+
+from characters import CharacterRegistry, build_inner_character_prompt, normalize_locale
+from completions import CompletionClient
+from episodic_memory import EpisodicMemoryStore, latest_user_message
+from predictor import AIPredictor, missing_answers
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for Flutter app
 
-# Load your trained model
-MODEL_PATH = 'model_files/ana_questionnaire_predictor.pkl'
 OPENAI_MODEL = os.getenv('OPENAI_MODEL', 'gpt-4o-mini')
 OPENAI_SUMMARY_MODEL = os.getenv('OPENAI_SUMMARY_MODEL', 'gpt-4o-mini')
-openai_client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+completion_client = CompletionClient(api_key=os.getenv('OPENAI_API_KEY'))
 
 #Initialize Firebase Admin SDK.
 try:
@@ -29,431 +28,15 @@ except ValueError:
 
 db = firestore.client()
 
-class AIPredictor:
-    def __init__(self):
-        print("Loading AI model...")
-        if not os.path.exists(MODEL_PATH):
-            raise FileNotFoundError(
-                f"Model file not found at {MODEL_PATH}. "
-                "Set ANA_MODEL_PATH or place the file in flask_server/model_files.",
-            )
-        with open(MODEL_PATH, 'rb') as f:
-            self.model_data = pickle.load(f)
-
-        self.model = self.model_data['model']
-        self.scaler = self.model_data['scaler']
-        self.pattern_models = self.model_data['pattern_models']
-        self.pattern_scalers = self.model_data['pattern_scalers']
-        self.feature_columns = self.model_data['feature_columns']
-        self.char_to_idx = self.model_data['char_to_idx']
-        self.idx_to_char = self.model_data['idx_to_char']
-        self.pattern_distribution = self.model_data['pattern_distribution']
-        print(f"Model loaded with {len(self.idx_to_char)} characters")
-        print(f"Available pattern models: {list(self.pattern_models.keys())}")
-
-    def predict(self, user_answers: Dict) -> Dict:
-        """Make prediction with user answers - matches Colab model exactly"""
-        try:
-            # Create feature engineer instance
-            features = self._create_features(user_answers)
-
-            # Ensure all feature columns exist
-            for col in self.feature_columns:
-                if col not in features.columns:
-                    features[col] = 0
-
-            features = features[self.feature_columns]
-
-            # Scale features
-            X_scaled = self.scaler.transform(features)
-
-            # Get predictions from main model
-            if hasattr(self.model, 'predict_proba'):
-                probabilities = self.model.predict_proba(X_scaled)[0]
-            else:
-                # Fallback: simple prediction
-                probabilities = np.zeros(len(self.char_to_idx))
-                prediction = self.model.predict(X_scaled)[0]
-                probabilities[prediction] = 0.8
-                # Add some probability to similar characters
-                for i in range(len(probabilities)):
-                    if i != prediction:
-                        probabilities[i] = 0.2 / (len(probabilities) - 1)
-
-            # Get top 3 predictions with their indices and probabilities
-            top_3_indices = np.argsort(probabilities)[-3:][::-1]
-
-            results = []
-            for i, idx in enumerate(top_3_indices, 1):
-                char_name = self.idx_to_char[idx]
-                confidence = float(probabilities[idx])
-
-                # Format confidence to match Colab output
-                if confidence < 0.1:
-                    confidence_formatted = f"{confidence:.1%}"
-                else:
-                    confidence_formatted = f"{confidence:.1%}"
-
-                # Get archetype
-                archetype = self._get_archetype(char_name)
-
-                # Get display name with "The" prefix
-                display_name = self._get_display_name(char_name)
-
-                # Get description
-                description = self._get_description(char_name)
-
-                # Get GLB file - fixed mapping based on your image.png
-                glb_file = self._get_glb_file(char_name)
-
-                # Generate user model insight
-                user_model = self._get_user_model(char_name, user_answers)
-
-                result = {
-                    'characterName': char_name,
-                    'displayName': display_name,
-                    'archetype': archetype,
-                    'confidence': confidence,
-                    'confidenceFormatted': confidence_formatted,
-                    'confidenceLabel': self._get_confidence_label(confidence),
-                    'rank': i,
-                    'glbFileName': glb_file,
-                    'description': description,
-                    'userModel': user_model,
-                    'patternType': 'mixed'  # Default, can be enhanced
-                }
-                results.append(result)
-
-            # Sort by confidence (already sorted but ensure)
-            results.sort(key=lambda x: x['confidence'], reverse=True)
-
-            return {
-                'success': True,
-                'predictions': results,
-                'message': 'Successfully analyzed responses',
-                'totalCharacters': len(self.idx_to_char),
-                'modelVersion': 'production_v1'
-            }
-
-        except Exception as e:
-            print(f"Prediction error: {e}")
-            traceback.print_exc()
-            return {
-                'success': False,
-                'error': str(e),
-                'predictions': []
-            }
-
-    def _create_features(self, user_answers):
-        """Create features matching Colab's AdvancedFeatureEngineer"""
-        df_input = pd.DataFrame([user_answers])
-        features = pd.DataFrame(index=df_input.index)
-
-        # Slider conversions - exactly as in Colab
-        slider_map = {'0-20%': 0.1, '21-50%': 0.35, '51-80%': 0.65, '81-100%': 0.9}
-
-        # 1. Basic numerical conversions
-        for q in ['Q2', 'Q4', 'Q8']:
-            if q in df_input.columns:
-                features[f'{q}_num'] = df_input[q].map(slider_map).fillna(0.5)
-
-        # 2. Count features with psychological meaning
-        for q in ['Q1', 'Q3', 'Q5', 'Q6', 'Q7', 'Q9', 'Q10', 'Q11', 'Q12', 'Q13']:
-            if q in df_input.columns:
-                features[f'{q}_count'] = df_input[q].apply(lambda x: len(str(x).split(',')) if pd.notna(x) else 0)
-
-        # 3. Initialize psychological dimension scores
-        features['perfectionism_score'] = 0
-        features['loneliness_score'] = 0
-        features['escapism_score'] = 0
-        features['self_criticism_score'] = 0
-        features['social_focus_score'] = 0
-        features['control_score'] = 0
-        features['vulnerability_score'] = 0
-
-        # 4. Key option indicators
-        key_options = {
-            'Q1': ['0', '2', '3', '5'],
-            'Q3': ['0', '1', '2', '3', '4'],
-            'Q5': ['0', '1', '2', '3', '4', '5'],
-            'Q7': ['0', '1', '3', '4', '5'],
-            'Q10': ['0', '1', '2', '3', '4'],
-            'Q11': ['0', '1', '2', '3', '4', '5'],
-            'Q12': ['0', '1', '2', '3', '4', '5'],
-            'Q13': ['0', '1', '2', '4', '5', '7']
-        }
-
-        for q, options in key_options.items():
-            if q in df_input.columns:
-                for option in options:
-                    col_name = f'{q}_opt_{option}'
-                    features[col_name] = df_input[q].apply(
-                        lambda x: 1 if option in str(x).split(',') else 0
-                    )
-
-        # 5. Pattern clarity indicators
-        features['clear_perfectionist'] = (
-            (features['Q2_num'] > 0.8) &
-            (features.get('Q1_opt_0', 0) == 1) &
-            (features.get('Q3_opt_0', 0) == 1)
-        ).astype(int)
-
-        features['clear_people_pleaser'] = (
-            (features.get('Q1_opt_2', 0) == 1) &
-            (features.get('Q10_opt_0', 0) == 1) &
-            (features.get('Q7_opt_3', 0) == 1)
-        ).astype(int)
-
-        features['clear_procrastinator'] = (
-            (features['Q8_num'] > 0.8) &
-            (features.get('Q1_opt_3', 0) == 1) &
-            (features.get('Q7_opt_4', 0) == 1)
-        ).astype(int)
-
-        features['clear_lonely'] = (
-            (features['Q4_num'] > 0.8) &
-            (features.get('Q11_opt_1', 0) == 1) &
-            (features.get('Q12_opt_3', 0) == 1)
-        ).astype(int)
-
-        features['clear_inner_critic'] = (
-            (features.get('Q3_opt_3', 0) == 1) &
-            (features.get('Q11_opt_0', 0) == 1) &
-            (features.get('Q7_opt_5', 0) == 1)
-        ).astype(int)
-
-        # 6. Calculate psychological scores
-        features['perfectionism_score'] = (
-            features['Q2_num'].fillna(0) * 0.4 +
-            features.get('Q1_opt_0', 0) * 0.3 +
-            features.get('Q3_opt_0', 0) * 0.3
-        )
-
-        features['loneliness_score'] = (
-            features['Q4_num'].fillna(0) * 0.5 +
-            features.get('Q11_opt_1', 0) * 0.3 +
-            features.get('Q12_opt_3', 0) * 0.2
-        )
-
-        features['escapism_score'] = (
-            features['Q8_num'].fillna(0) * 0.5 +
-            features.get('Q1_opt_3', 0) * 0.2 +
-            features.get('Q7_opt_4', 0) * 0.2 +
-            features.get('Q7_opt_1', 0) * 0.1
-        )
-
-        features['self_criticism_score'] = (
-            features.get('Q11_opt_0', 0) * 0.4 +
-            features.get('Q7_opt_5', 0) * 0.3 +
-            features.get('Q3_opt_3', 0) * 0.3
-        )
-
-        features['social_focus_score'] = (
-            features.get('Q1_opt_2', 0) * 0.4 +
-            features.get('Q10_opt_0', 0) * 0.3 +
-            features.get('Q7_opt_3', 0) * 0.3
-        )
-
-        features['control_score'] = (
-            features.get('Q1_opt_0', 0) * 0.4 +
-            features.get('Q7_opt_0', 0) * 0.3 +
-            features.get('Q10_opt_1', 0) * 0.3
-        )
-
-        features['vulnerability_score'] = (
-            features.get('Q3_opt_2', 0) * 0.3 +
-            features.get('Q6_opt_1', 0) * 0.3 +
-            features.get('Q9_opt_4', 0) * 0.2 +
-            features.get('Q13_opt_0', 0) * 0.2
-        )
-
-        # 7. Pattern metrics
-        clear_pattern_cols = [c for c in features.columns if c.startswith('clear_')]
-        if clear_pattern_cols:
-            features['clear_pattern_count'] = features[clear_pattern_cols].sum(axis=1)
-            features['has_clear_pattern'] = (features['clear_pattern_count'] > 0).astype(int)
-            features['has_multiple_clear'] = (features['clear_pattern_count'] > 1).astype(int)
-
-        # 8. Response consistency
-        slider_cols = [c for c in features.columns if c.endswith('_num')]
-        if len(slider_cols) > 1:
-            features['slider_consistency'] = 1 - features[slider_cols].std(axis=1).fillna(0)
-
-        count_cols = [c for c in features.columns if c.endswith('_count')]
-        if len(count_cols) > 1:
-            features['selection_consistency'] = 1 - (features[count_cols].std(axis=1) / 3).fillna(0)
-
-        # 9. Archetype dominance
-        manager_indicators = features.get('clear_perfectionist', 0) + \
-                           features.get('clear_people_pleaser', 0) + \
-                           features.get('clear_inner_critic', 0) + \
-                           features.get('Q1_opt_0', 0)
-
-        firefighter_indicators = features.get('clear_procrastinator', 0) + \
-                                (features['Q8_num'] > 0.7).astype(int)
-
-        exile_indicators = features.get('clear_lonely', 0) + \
-                          (features['Q4_num'] > 0.7).astype(int)
-
-        total_indicators = manager_indicators + firefighter_indicators + exile_indicators
-        features['archetype_clarity'] = np.where(
-            total_indicators > 0,
-            np.maximum(manager_indicators, np.maximum(firefighter_indicators, exile_indicators)) / total_indicators,
-            0.5
-        )
-
-        # 10. Total ambiguity score
-        features['total_ambiguity'] = (
-            (features.get('clear_pattern_count', 0) == 0).astype(float) * 0.3 +
-            features.get('has_multiple_clear', 0).astype(float) * 0.3 +
-            (features.get('slider_consistency', 0.5) < 0.7).astype(float) * 0.2 +
-            (features.get('selection_consistency', 0.5) < 0.6).astype(float) * 0.2
-        )
-
-        # 11. Psychological tension indicators
-        features['perfection_vs_procrastination'] = (
-            features['perfectionism_score'] * features['escapism_score']
-        )
-
-        features['control_vs_vulnerability'] = (
-            features['control_score'] * features['vulnerability_score']
-        )
-
-        features['inner_conflict_score'] = (
-            features['perfection_vs_procrastination'] * 0.4 +
-            features['control_vs_vulnerability'] * 0.3 +
-            features['total_ambiguity'] * 0.3
-        )
+# Turn-level episodic memories, recalled by local embedding similarity.
+episodic_store = EpisodicMemoryStore()
 
-        # Fill NaN values and clip
-        features = features.fillna(0)
-        for col in features.columns:
-            if features[col].dtype in ['float64', 'float32']:
-                features[col] = np.clip(features[col], 0, 1)
-
-        return features
-
-    def _get_display_name(self, char_name):
-        """Convert character name to display name"""
-        display_names = {
-            'Perfectionist': 'The Perfectionist',
-            'Inner Critic': 'The Inner Critic',
-            'People Pleaser': 'The People Pleaser',
-            'Controller': 'The Controller',
-            'Stoic Part': 'The Stoic Part',
-            'Workaholic': 'The Workaholic',
-            'Confused Part': 'The Confused Part',
-            'Procrastinator': 'The Procrastinator',
-            'Overeater/Binger': 'The Overeater/Binger',
-            'Excessive Gamer': 'The Excessive Gamer',
-            'Lonely Part': 'The Lonely Part',
-            'Fearful Part': 'The Fearful Part',
-            'Neglected Part': 'The Neglected Part',
-            'Ashamed Part': 'The Ashamed Part',
-            'Overwhelmed Part': 'The Overwhelmed Part',
-            'Dependent Part': 'The Dependent Part',
-            'Jealous Part': 'The Jealous Part',
-            'Wounded Child': 'The Wounded Child'
-        }
-        return display_names.get(char_name, char_name)
-
-    def _get_archetype(self, char_name):
-        """Determine archetype from character name - matches Colab"""
-        managers = ["Inner Critic", "Perfectionist", "People Pleaser", "Controller",
-                   "Stoic Part", "Workaholic", "Confused Part"]
-        firefighters = ["Procrastinator", "Overeater/Binger", "Excessive Gamer"]
-        exiles = ["Lonely Part", "Fearful Part", "Neglected Part", "Ashamed Part",
-                 "Overwhelmed Part", "Dependent Part", "Jealous Part", "Wounded Child"]
-
-        if char_name in managers:
-            return 'manager'
-        elif char_name in firefighters:
-            return 'firefighter'
-        elif char_name in exiles:
-            return 'exile'
-        else:
-            return 'unknown'
-
-    def _get_glb_file(self, char_name):
-        """Map character to 3D model file - based on your image.png"""
-        file_map = {
-            'Inner Critic': 'inner_critic.glb',
-            'People Pleaser': 'people_pleaser.glb',
-            'Lonely Part': 'lonely_part.glb',
-            'Jealous Part': 'jealous_part.glb',
-            'Ashamed Part': 'ashamed_part.glb',
-            'Workaholic': 'workaholic.glb',
-            'Perfectionist': 'perfectionist.glb',
-            'Procrastinator': 'procrastinator.glb',
-            'Excessive Gamer': 'excessive_gamer.glb',
-            'Confused Part': 'confused_part.glb',
-            'Dependent Part': 'dependent_part.glb',
-            'Fearful Part': 'fearful_part.glb',
-            'Neglected Part': 'neglected_part.glb',
-            'Overeater/Binger': 'overeater-binger.glb',
-            'Overwhelmed Part': 'overwhelmed_part.glb',
-            'Stoic Part': 'stoic_part.glb',
-            'Wounded Child': 'wounded_child.glb',
-            'Controller': 'controller_part.glb'  # Assuming this exists
-        }
-        return file_map.get(char_name, 'inner_critic.glb')
-
-    def _get_description(self, char_name):
-        """Get character description"""
-        descriptions = {
-            'Inner Critic': 'This part helps you stay safe by pointing out potential mistakes and keeping you from taking risks.',
-            'People Pleaser': 'This part works hard to make sure others are happy with you, often suppressing your own needs.',
-            'Lonely Part': 'This part holds feelings of isolation and longing for connection from earlier experiences.',
-            'Perfectionist': 'This part demands flawless performance and sets extremely high standards to prevent criticism.',
-            'Controller': 'This part tries to manage everything and everyone to create a sense of safety and predictability.',
-            'Stoic Part': 'This protector suppresses emotions and maintains emotional distance as a survival strategy.',
-            'Workaholic': 'This part keeps you constantly busy and productive to avoid facing difficult emotions or inner emptiness.',
-            'Confused Part': 'This part emerges when you feel overwhelmed by choices, uncertain about decisions, or disconnected from your intuition.',
-            'Procrastinator': 'This protective part delays important tasks to avoid potential failure, overwhelm, or facing difficult emotions.',
-            'Overeater/Binger': 'This part uses food to soothe emotional pain, fill inner emptiness, or numb difficult feelings.',
-            'Excessive Gamer': 'This part uses gaming as an escape from real-world challenges, uncomfortable emotions, or feelings of inadequacy.',
-            'Fearful Part': 'This vigilant protector constantly scans for potential threats and risks.',
-            'Neglected Part': 'This wounded part holds memories of being overlooked, not listened to, or emotionally abandoned.',
-            'Ashamed Part': 'This wounded part carries deep feelings of unworthiness and self-consciousness from past experiences.',
-            'Overwhelmed Part': 'This part feels unable to cope with the demands and responsibilities of life.',
-            'Dependent Part': 'This part fears autonomy and constantly seeks external validation and support.',
-            'Jealous Part': 'This protective part emerges when you see others as threats to your relationships or success.',
-            'Wounded Child': 'This vulnerable part carries childhood pain, trauma, and unmet emotional needs.'
-        }
-        return descriptions.get(char_name, 'An inner part that plays a role in your emotional world.')
-
-    def _get_user_model(self, char_name, answers):
-        """Generate personalized insight based on answers"""
-        # Simplified version - can be enhanced
-        archetype = self._get_archetype(char_name)
-
-        if archetype == 'manager':
-            return f'Your {char_name.lower()} works proactively to prevent difficult emotions through control and high standards.'
-        elif archetype == 'firefighter':
-            return f'Your {char_name.lower()} reacts quickly to emotional distress through distraction or numbing behaviors.'
-        elif archetype == 'exile':
-            return f'Your {char_name.lower()} carries emotional burdens from past experiences and needs compassionate attention.'
-        else:
-            return f'Your responses suggest this {char_name.lower()} is active in situations involving decision-making and self-evaluation.'
-
-    def _get_confidence_label(self, confidence):
-        """Convert confidence to human-readable label - matches Colab"""
-        if confidence >= 0.9:
-            return "Very High Confidence"
-        elif confidence >= 0.85:
-            return "High Confidence"
-        elif confidence >= 0.8:
-            return "Moderate-High Confidence"
-        elif confidence >= 0.7:
-            return "Moderate Confidence"
-        elif confidence >= 0.6:
-            return "Low-Moderate Confidence"
-        elif confidence >= 0.5:
-            return "Low Confidence"
-        elif confidence >= 0.3:
-            return "Very Low Confidence"
-        else:
-            return "Minimal Confidence"
+# Persona completions for /chat/council run concurrently on this pool.
+COUNCIL_MAX_PARTS = int(os.getenv('COUNCIL_MAX_PARTS', '6'))
+council_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('COUNCIL_MAX_WORKERS', '16')),
+    thread_name_prefix='council',
+)
 
 # Initialize predictor
 predictor = None
@@ -463,9 +46,30 @@ try:
 except Exception as e:
     predictor_error = str(e)
 
+# Load character profiles and precompile their persona prompts.
+# Needs assets/data/inner_characters_data.json (or ANA_CHARACTERS_PATH) on the server.
+character_registry = None
+character_registry_error = None
+try:
+    character_registry = CharacterRegistry()
+except Exception as e:
+    character_registry_error = str(e)
+    print(f"Character registry not loaded: {e}")
+
 @app.route('/health', methods=['GET'])
 def health_check():
-    return jsonify({'status': 'healthy', 'model_loaded': True, 'characters': len(predictor.idx_to_char)})
+    return jsonify({
+        'status': 'healthy',
+        'model_loaded': True,
+        'characters': len(predictor.idx_to_char),
+        'character_registry_loaded': character_registry is not None,
+        'character_profiles': len(character_registry.ids()) if character_registry else 0,
+        'character_registry_error': character_registry_error,
+    })
+
+@app.route('/metrics/completions', methods=['GET'])
+def completion_metrics():
+    return jsonify({'success': True, 'models': completion_client.metrics()})
 
 @app.route('/predict', methods=['POST'])
 def predict():
@@ -487,8 +91,7 @@ def predict():
         user_answers = data['answers']
 
         # Validate required questions
-        required_questions = [f'Q{i}' for i in range(1, 14)]
-        missing = [q for q in required_questions if q not in user_answers]
+        missing = missing_answers(user_answers)
 
         if missing:
             return jsonify({
@@ -507,76 +110,99 @@ def predict():
             'error': f'Server error: {str(e)}'
         }), 500
 
-#Build a system prompt for the inner character.
-def build_inner_character_prompt(character_profile: Dict) -> str:
-    display_name = character_profile.get('displayName', 'Inner Part')
-    role = character_profile.get('role', 'Inner Part')
-    short_description = character_profile.get('shortDescription', '')
-    why_i_exist = character_profile.get('whyIExist', '')
-    triggers = character_profile.get('triggers', [])
-    core_belief = character_profile.get('coreBelief', '')
-    intention = character_profile.get('intention', '')
-    fear = character_profile.get('fear', '')
-    what_i_need = character_profile.get('whatINeed', [])
-
-    return f"""
-You are {display_name}, an inner part in an IFS-style healing conversation.
-You are not a therapist or a doctor. You speak as a real inner part of the user.
-
-Role: {role}
-Short description: {short_description}
-Why I exist: {why_i_exist}
-Triggers: {', '.join(triggers)}
-Core belief: {core_belief}
-Intention: {intention}
-Fear: {fear}
-What I need: {', '.join(what_i_need)}
-
-Guidelines:
-- Stay in-character as {display_name}.
-- Keep responses grounded, compassionate, and healing-focused.
-- Use gentle questions to help the user connect with this part.
-- Avoid clinical language and avoid giving medical advice.
-- Keep the tone realistic and human, not robotic.
-""".strip()
+#Check that a character can be resolved; returns an (error, status) pair when it cannot.
+def character_lookup_error(character_id: str, character_profile: Dict) -> Optional[Tuple[str, int]]:
+    if character_registry is not None and character_id in character_registry:
+        return None
+    if character_profile:
+        return None
+    if character_registry is None:
+        return f'Character registry not available: {character_registry_error}', 503
+    return f'Unknown characterId: {character_id}', 400
+
+
+#Resolve the profile and persona prompt for a character, preferring the server-side registry.
+def resolve_character(
+    character_id: str,
+    character_profile: Dict,
+    locale: str,
+) -> Tuple[Dict, str]:
+    if character_registry is not None and character_id in character_registry:
+        return (
+            character_registry.get_profile(character_id, locale),
+            character_registry.get_prompt(character_id, locale),
+        )
+    return character_profile, build_inner_character_prompt(character_profile, locale)
 
 #Build a system prompt for the inner character with memory.
 def build_system_prompt_with_memory(
-    character_profile: Dict,
+    base_prompt: str,
     memory_summary: str,
+    recalled_memories: Optional[List[str]] = None,
 ) -> str:
-    base_prompt = build_inner_character_prompt(character_profile)
-    if not memory_summary:
-        return base_prompt
-
-    return f"""{base_prompt}
+    prompt = base_prompt
+    if memory_summary:
+        prompt += f"""
 
 Memory summary (use only if relevant):
-{memory_summary}
-""".strip()
+{memory_summary}"""
+    if recalled_memories:
+        recalled = '\n'.join(f'- {memory}' for memory in recalled_memories)
+        prompt += f"""
 
+Relevant past moments (use only if relevant):
+{recalled}"""
+    return prompt.strip()
 
-#Load the memory summary for the inner character.
-def load_agent_memory_summary(uid: str, character_id: str) -> str:
-    doc_ref = db.collection('users').document(uid).collection('agent_memory').document(character_id)
-    snapshot = doc_ref.get()
-    if snapshot.exists:
-        data = snapshot.to_dict() or {}
-        return data.get('summary', '') or ''
-    return ''
 
+#Get the memory document reference for the inner character.
+def agent_memory_ref(uid: str, character_id: str):
+    return db.collection('users').document(uid).collection('agent_memory').document(character_id)
 
-#Save the memory summary for the inner character.
-def save_agent_memory_summary(uid: str, character_id: str, summary: str) -> None:
-    doc_ref = db.collection('users').document(uid).collection('agent_memory').document(character_id)
-    doc_ref.set({
+
+#Write a document directly, or queue it on a Firestore batch when one is given.
+def write_document(doc_ref, data: Dict[str, Any], merge: bool = False, batch=None) -> None:
+    if batch is not None:
+        batch.set(doc_ref, data, merge=merge)
+    else:
+        doc_ref.set(data, merge=merge)
+
+
+#Load the memory document (summary and episodes) for the inner character.
+def load_agent_memory(uid: str, character_id: str) -> Dict[str, Any]:
+    snapshot = agent_memory_ref(uid, character_id).get()
+    if snapshot.exists:
+        return snapshot.to_dict() or {}
+    return {}
+
+
+#Load the memory documents for several inner characters in one read.
+def load_agent_memories(uid: str, character_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    memories = {character_id: {} for character_id in character_ids}
+    refs = [agent_memory_ref(uid, character_id) for character_id in memories]
+    for snapshot in db.get_all(refs):
+        if snapshot.exists:
+            memories[snapshot.id] = snapshot.to_dict() or {}
+    return memories
+
+
+#Save the memory summary (and any episode fields) for the inner character.
+def save_agent_memory_summary(
+    uid: str,
+    character_id: str,
+    summary: str,
+    episode_fields: Optional[Dict[str, Any]] = None,
+    batch=None,
+) -> None:
+    write_document(agent_memory_ref(uid, character_id), {
         'summary': summary,
+        **(episode_fields or {}),
         'updatedAt': firestore.SERVER_TIMESTAMP,
-    }, merge=True)
+    }, merge=True, batch=batch)
 
 
 #Update the progress summary for the inner character.
-def update_progress_summary(uid: str, data: Dict[str, Any]) -> None:
+def update_progress_summary(uid: str, data: Dict[str, Any], batch=None) -> None:
     updates = {}
     if 'breakthrough' in data and 'notes' not in data:
         data['notes'] = data.get('breakthrough')
@@ -590,27 +216,27 @@ def update_progress_summary(uid: str, data: Dict[str, Any]) -> None:
         updates['progressSummary.notes'] = data['notes']
     if updates:
         updates['updatedAt'] = firestore.SERVER_TIMESTAMP
-        db.collection('users').document(uid).set(updates, merge=True)
+        write_document(db.collection('users').document(uid), updates, merge=True, batch=batch)
 
 
 #Add a timeline event for the inner character.
-def add_timeline_event(uid: str, data: Dict[str, Any]) -> None:
+def add_timeline_event(uid: str, data: Dict[str, Any], batch=None) -> None:
     event_ref = db.collection('users').document(uid).collection('timeline').document()
-    event_ref.set({
+    write_document(event_ref, {
         'type': data.get('type', 'note'),
         'title': data.get('title', ''),
         'summary': data.get('summary', ''),
         'refPath': data.get('refPath'),
         'createdAt': firestore.SERVER_TIMESTAMP,
-    })
+    }, batch=batch)
 
 
 #Set the last agent run for the inner character.
-def set_last_agent_run(uid: str) -> None:
-    db.collection('users').document(uid).set({
+def set_last_agent_run(uid: str, batch=None) -> None:
+    write_document(db.collection('users').document(uid), {
         'lastAgentRunAt': firestore.SERVER_TIMESTAMP,
         'updatedAt': firestore.SERVER_TIMESTAMP,
-    }, merge=True)
+    }, merge=True, batch=batch)
 
 
 #Run an agent step for the inner character.
@@ -632,9 +258,10 @@ def run_agent_step(system_prompt: str, messages: List[Dict[str, str]]) -> Dict[s
         if role in ['user', 'assistant'] and content:
             agent_messages.append({'role': role, 'content': content})
 
-    response = openai_client.chat.completions.create(
-        model=OPENAI_MODEL,
-        messages=agent_messages,
+    response = completion_client.create(
+        'agent_step',
+        OPENAI_MODEL,
+        agent_messages,
         temperature=0.7,
         response_format={"type": "json_object"},
     )
@@ -647,17 +274,17 @@ def run_agent_step(system_prompt: str, messages: List[Dict[str, str]]) -> Dict[s
 
 
 #Run tool calls for the inner character.
-def run_tool_calls(uid: str, tool_calls: List[Dict[str, Any]]) -> None:
+def run_tool_calls(uid: str, tool_calls: List[Dict[str, Any]], batch=None) -> None:
     for call in tool_calls:
         name = call.get('name')
         args = call.get('args') or {}
         print(f"[agent] tool_call: {name} args={args}")
         if name == 'update_progress_summary':
-            update_progress_summary(uid, args)
+            update_progress_summary(uid, args, batch=batch)
         elif name == 'add_timeline_event':
-            add_timeline_event(uid, args)
+            add_timeline_event(uid, args, batch=batch)
         elif name == 'set_last_agent_run':
-            set_last_agent_run(uid)
+            set_last_agent_run(uid, batch=batch)
 
 
 #Build a memory summary prompt for the inner character.
@@ -685,14 +312,45 @@ def generate_updated_summary(
     existing_summary: str,
     messages: List[Dict[str, str]],
 ) -> str:
-    response = openai_client.chat.completions.create(
-        model=OPENAI_SUMMARY_MODEL,
-        messages=build_memory_summary_prompt(existing_summary, messages),
-        temperature=0.2,
-    )
+    try:
+        response = completion_client.create(
+            'memory_summary',
+            OPENAI_SUMMARY_MODEL,
+            build_memory_summary_prompt(existing_summary, messages),
+            temperature=0.2,
+        )
+    except Exception as e:
+        # Keep the previous memory rather than failing the whole chat turn.
+        print(f"[agent] memory_summary_failed: {e}")
+        return existing_summary
     return (response.choices[0].message.content or '').strip()
 
 
+#Run one chat turn for the inner character, returning its reply, tool calls and new memory.
+def run_character_turn(
+    base_prompt: str,
+    memory_summary: str,
+    messages: List[Dict[str, str]],
+    recalled_memories: Optional[List[str]] = None,
+) -> Tuple[str, List[Dict[str, Any]], str]:
+    system_prompt = build_system_prompt_with_memory(
+        base_prompt,
+        memory_summary,
+        recalled_memories,
+    )
+    agent_result = run_agent_step(system_prompt, messages)
+    tool_calls = agent_result.get('toolCalls') or []
+
+    assistant_message = agent_result.get('assistantMessage', '')
+    updated_summary = agent_result.get('memorySummary', '')
+    if not updated_summary:
+        updated_summary = generate_updated_summary(
+            memory_summary,
+            messages + [{'role': 'assistant', 'content': assistant_message}],
+        )
+    return assistant_message, tool_calls, updated_summary
+
+
 #Handle a chat request for the inner character.
 @app.route('/chat', methods=['POST'])
 def chat():
@@ -710,36 +368,46 @@ def chat():
                 'success': False,
                 'error': 'uid is required'
             }), 400
-        character_profile = data.get('characterProfile') or {}
         character_id = data.get('characterId', 'inner_critic')
+        locale = normalize_locale(data.get('locale'))
         messages = data.get('messages') or []
-
-        memory_summary = load_agent_memory_summary(uid, character_id)
-        system_prompt = build_system_prompt_with_memory(
+        character_profile = data.get('characterProfile') or {}
+        lookup_error = character_lookup_error(character_id, character_profile)
+        if lookup_error:
+            error, status = lookup_error
+            return jsonify({
+                'success': False,
+                'error': error
+            }), status
+        _, base_prompt = resolve_character(
+            character_id,
             character_profile,
-            memory_summary,
+            locale,
         )
-        openai_messages = [{'role': 'system', 'content': system_prompt}]
 
-        for message in messages:
-            role = message.get('role')
-            content = message.get('content', '')
-            if role in ['user', 'assistant'] and content:
-                openai_messages.append({'role': role, 'content': content})
-
-        agent_result = run_agent_step(system_prompt, messages)
-        tool_calls = agent_result.get('toolCalls') or []
+        memory = load_agent_memory(uid, character_id)
+        memory_summary = memory.get('summary', '') or ''
+        episode_index = episodic_store.get_index(uid, character_id, memory)
+        recalled_memories = episode_index.search(
+            latest_user_message(messages),
+            recent_messages=messages,
+        )
+        assistant_message, tool_calls, updated_summary = run_character_turn(
+            base_prompt,
+            memory_summary,
+            messages,
+            recalled_memories,
+        )
         run_tool_calls(uid, tool_calls)
-
-        assistant_message = agent_result.get('assistantMessage', '')
-        updated_summary = agent_result.get('memorySummary', '')
-        if not updated_summary:
-            updated_summary = generate_updated_summary(
-                memory_summary,
-                messages + [{'role': 'assistant', 'content': assistant_message}],
-            )
-        save_agent_memory_summary(uid, character_id, updated_summary)
-        print(f"[agent] memory_summary_updated: {bool(updated_summary)}")
+        episode_fields = episodic_store.record_turn(
+            uid,
+            character_id,
+            episode_index,
+            messages,
+            assistant_message,
+        )
+        save_agent_memory_summary(uid, character_id, updated_summary, episode_fields)
+        print(f"[agent] memory_summary_updated: {bool(updated_summary)} recalled={len(recalled_memories)}")
 
         return jsonify({
             'success': True,
@@ -752,5 +420,128 @@ def chat():
             'error': f'Chat error: {str(e)}'
         }), 500
 
+#Handle a chat request addressed to several inner characters at once.
+@app.route('/chat/council', methods=['POST'])
+def chat_council():
+    try:
+        if not os.getenv('OPENAI_API_KEY'):
+            return jsonify({
+                'success': False,
+                'error': 'OPENAI_API_KEY is not set'
+            }), 500
+
+        data = request.json or {}
+        uid = data.get('uid')
+        if not uid:
+            return jsonify({
+                'success': False,
+                'error': 'uid is required'
+            }), 400
+        characters = data.get('characters') or []
+        if not isinstance(characters, list) or not all(isinstance(c, dict) for c in characters):
+            return jsonify({
+                'success': False,
+                'error': 'characters must be a list of objects'
+            }), 400
+        locale = normalize_locale(data.get('locale'))
+        messages = data.get('messages') or []
+
+        parts = []
+        seen_ids = set()
+        for character in characters:
+            character_id = character.get('characterId')
+            if not character_id or character_id in seen_ids:
+                continue
+            seen_ids.add(character_id)
+            character_profile = character.get('characterProfile') or {}
+            lookup_error = character_lookup_error(character_id, character_profile)
+            if lookup_error:
+                error, status = lookup_error
+                return jsonify({
+                    'success': False,
+                    'error': error
+                }), status
+            character_profile, base_prompt = resolve_character(
+                character_id,
+                character_profile,
+                locale,
+            )
+            parts.append((character_id, character_profile, base_prompt))
+        if not parts:
+            return jsonify({
+                'success': False,
+                'error': 'characters must contain at least one characterId'
+            }), 400
+        if len(parts) > COUNCIL_MAX_PARTS:
+            return jsonify({
+                'success': False,
+                'error': f'At most {COUNCIL_MAX_PARTS} characters per council request'
+            }), 400
+
+        memories = load_agent_memories(uid, [character_id for character_id, _, _ in parts])
+        query = latest_user_message(messages)
+        episode_indexes = {}
+        futures = []
+        for character_id, _, base_prompt in parts:
+            memory = memories[character_id]
+            episode_indexes[character_id] = episodic_store.get_index(uid, character_id, memory)
+            futures.append(council_executor.submit(
+                run_character_turn,
+                base_prompt,
+                memory.get('summary', '') or '',
+                messages,
+                episode_indexes[character_id].search(query, recent_messages=messages),
+            ))
+
+        replies = []
+        all_tool_calls = []
+        batch = db.batch()
+        for (character_id, character_profile, _), future in zip(parts, futures):
+            try:
+                assistant_message, tool_calls, updated_summary = future.result()
+            except Exception as e:
+                print(f"[agent] council part failed: {character_id}: {e}")
+                replies.append({
+                    'characterId': character_id,
+                    'displayName': character_profile.get('displayName', ''),
+                    'success': False,
+                    'error': str(e),
+                })
+                continue
+            run_tool_calls(uid, tool_calls, batch=batch)
+            episode_fields = episodic_store.record_turn(
+                uid,
+                character_id,
+                episode_indexes[character_id],
+                messages,
+                assistant_message,
+            )
+            save_agent_memory_summary(uid, character_id, updated_summary, episode_fields, batch=batch)
+            all_tool_calls.extend(tool_calls)
+            replies.append({
+                'characterId': character_id,
+                'displayName': character_profile.get('displayName', ''),
+                'success': True,
+                'assistantMessage': assistant_message,
+                'toolCalls': tool_calls,
+            })
+        try:
+            batch.commit()
+            print(f"[agent] council memory_summaries_updated: {sum(r['success'] for r in replies)}/{len(parts)}")
+        except Exception as e:
+            # The replies are already generated; losing this turn's memory is better than losing them.
+            print(f"[agent] council memory commit failed: {e}")
+
+        return jsonify({
+            'success': any(r['success'] for r in replies),
+            'replies': replies,
+            'toolCalls': all_tool_calls,
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'Council chat error: {str(e)}'
+        }), 500
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5001, debug=True)
@@ -0,0 +1,329 @@
+"""Offline bulk scoring and evaluation for questionnaire submissions.
+
+Streams answer records from JSONL/CSV/Parquet in chunks, shards the chunks
+across a process pool (each worker loads the model once) and writes
+predictions to a JSONL file as chunks complete. When records carry a label,
+top-1/top-3 accuracy and confidence calibration are reported per character.
+
+Example:
+    python bulk_score.py submissions.jsonl -o predictions.jsonl --workers 8
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from predictor import AIPredictor, MODEL_PATH, REQUIRED_QUESTIONS, missing_answers
+
+CALIBRATION_BINS = 10
+
+# Per-process predictor, loaded once by the pool initializer.
+_worker_predictor = None
+
+
+#Load the model once per worker process.
+def _init_worker(model_path: str) -> None:
+    global _worker_predictor
+    _worker_predictor = AIPredictor(model_path, verbose=False)
+
+
+#Pull the answers dict out of a raw record.
+def extract_answers(record: Dict[str, Any]) -> Dict[str, Any]:
+    answers = record.get('answers')
+    if isinstance(answers, dict):
+        return answers
+    return {q: record[q] for q in REQUIRED_QUESTIONS if q in record}
+
+
+#Read records in chunks from a JSONL, CSV or Parquet file.
+def iter_record_chunks(path: str, chunk_size: int, input_format: Optional[str] = None) -> Iterator[List[Dict]]:
+    fmt = input_format or os.path.splitext(path)[1].lstrip('.').lower()
+    if fmt in ('jsonl', 'ndjson', 'json'):
+        chunk = []
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                chunk.append(json.loads(line))
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+        if chunk:
+            yield chunk
+    elif fmt == 'csv':
+        # Keep answers as strings so multi-select values like "0,2" survive, and
+        # turn blank cells into None so they score the same as in JSONL/Parquet.
+        for frame in pd.read_csv(path, dtype=str, chunksize=chunk_size):
+            yield frame.astype(object).where(frame.notna(), None).to_dict('records')
+    elif fmt == 'parquet':
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError('Reading Parquet input requires pyarrow (pip install pyarrow).')
+        parquet_file = pq.ParquetFile(path)
+        for batch in parquet_file.iter_batches(batch_size=chunk_size):
+            yield batch.to_pylist()
+    else:
+        raise ValueError(f'Unsupported input format: {fmt!r} (expected jsonl, csv or parquet)')
+
+
+#Create empty evaluation counters for one character.
+def _empty_character_stats() -> Dict[str, float]:
+    return {
+        'support': 0,
+        'top1Hits': 0,
+        'top3Hits': 0,
+        'predicted': 0,
+        'predictedCorrect': 0,
+        'predictedConfidenceSum': 0.0,
+    }
+
+
+#Create empty evaluation counters for a whole run.
+def empty_metrics() -> Dict[str, Any]:
+    return {
+        'labelled': 0,
+        'top1Hits': 0,
+        'top3Hits': 0,
+        'binCounts': [0] * CALIBRATION_BINS,
+        'binCorrect': [0] * CALIBRATION_BINS,
+        'binConfidenceSum': [0.0] * CALIBRATION_BINS,
+        'characters': {},
+    }
+
+
+#Fold one chunk's evaluation counters into the running totals.
+def merge_metrics(total: Dict[str, Any], partial: Dict[str, Any]) -> None:
+    for key in ('labelled', 'top1Hits', 'top3Hits'):
+        total[key] += partial[key]
+    for key in ('binCounts', 'binCorrect', 'binConfidenceSum'):
+        total[key] = [a + b for a, b in zip(total[key], partial[key])]
+    for char_name, stats in partial['characters'].items():
+        target = total['characters'].setdefault(char_name, _empty_character_stats())
+        for key, value in stats.items():
+            target[key] += value
+
+
+#Output line for a record that could not be scored.
+def _error_line(record: Dict[str, Any], id_field: str, error: str) -> str:
+    return json.dumps({'id': record.get(id_field), 'success': False, 'error': error})
+
+
+#Score one chunk of records inside a worker process.
+def score_chunk(records: List[Dict], id_field: str, label_field: Optional[str]) -> Dict[str, Any]:
+    predictor = _worker_predictor
+    output_lines = [None] * len(records)
+    metrics = empty_metrics()
+    errors = 0
+
+    # Same check as /predict, so a record never depends on which chunk it lands in.
+    scorable = []
+    for position, record in enumerate(records):
+        answers = extract_answers(record)
+        missing = missing_answers(answers)
+        if missing:
+            output_lines[position] = _error_line(record, id_field, f'Missing answers for: {", ".join(missing)}')
+            errors += 1
+        else:
+            scorable.append((position, answers))
+
+    probabilities = {}
+    if scorable:
+        try:
+            batch = predictor.predict_proba_batch([answers for _, answers in scorable])
+            probabilities = {position: batch[row] for row, (position, _) in enumerate(scorable)}
+        except Exception:
+            # One bad record fails the whole batch; retry one by one to isolate it.
+            for position, answers in scorable:
+                try:
+                    probabilities[position] = predictor.predict_proba_batch([answers])[0]
+                except Exception as e:
+                    output_lines[position] = _error_line(records[position], id_field, str(e))
+                    errors += 1
+
+    for position, row in probabilities.items():
+        record = records[position]
+        top_3 = np.argsort(row)[-3:][::-1]
+        ranked = [(predictor.idx_to_char[idx], float(row[idx])) for idx in top_3]
+        result = {
+            'id': record.get(id_field),
+            'success': True,
+            'predictions': [
+                {'characterName': name, 'confidence': confidence, 'rank': rank}
+                for rank, (name, confidence) in enumerate(ranked, 1)
+            ],
+        }
+
+        label = record.get(label_field) if label_field else None
+        if label not in (None, ''):
+            label = str(label)
+            result['label'] = label
+            top1_name, top1_confidence = ranked[0]
+            top1_hit = top1_name == label
+            top3_hit = any(name == label for name, _ in ranked)
+
+            metrics['labelled'] += 1
+            metrics['top1Hits'] += int(top1_hit)
+            metrics['top3Hits'] += int(top3_hit)
+            bin_idx = min(int(top1_confidence * CALIBRATION_BINS), CALIBRATION_BINS - 1)
+            metrics['binCounts'][bin_idx] += 1
+            metrics['binCorrect'][bin_idx] += int(top1_hit)
+            metrics['binConfidenceSum'][bin_idx] += top1_confidence
+
+            true_stats = metrics['characters'].setdefault(label, _empty_character_stats())
+            true_stats['support'] += 1
+            true_stats['top1Hits'] += int(top1_hit)
+            true_stats['top3Hits'] += int(top3_hit)
+            predicted_stats = metrics['characters'].setdefault(top1_name, _empty_character_stats())
+            predicted_stats['predicted'] += 1
+            predicted_stats['predictedCorrect'] += int(top1_hit)
+            predicted_stats['predictedConfidenceSum'] += top1_confidence
+
+        output_lines[position] = json.dumps(result)
+
+    return {'lines': output_lines, 'metrics': metrics, 'errors': errors}
+
+
+#Turn accumulated counters into the evaluation report.
+def build_report(metrics: Dict[str, Any]) -> Dict[str, Any]:
+    labelled = metrics['labelled']
+    if not labelled:
+        return {'labelled': 0}
+
+    calibration = []
+    ece = 0.0
+    for i in range(CALIBRATION_BINS):
+        count = metrics['binCounts'][i]
+        if not count:
+            continue
+        accuracy = metrics['binCorrect'][i] / count
+        confidence = metrics['binConfidenceSum'][i] / count
+        ece += count / labelled * abs(accuracy - confidence)
+        calibration.append({
+            'bin': [i / CALIBRATION_BINS, (i + 1) / CALIBRATION_BINS],
+            'count': count,
+            'accuracy': accuracy,
+            'meanConfidence': confidence,
+        })
+
+    characters = {}
+    for char_name, stats in sorted(metrics['characters'].items()):
+        support = stats['support']
+        predicted = stats['predicted']
+        mean_confidence = stats['predictedConfidenceSum'] / predicted if predicted else None
+        precision = stats['predictedCorrect'] / predicted if predicted else None
+        characters[char_name] = {
+            'support': support,
+            'top1Accuracy': stats['top1Hits'] / support if support else None,
+            'top3Accuracy': stats['top3Hits'] / support if support else None,
+            'predicted': predicted,
+            'meanConfidence': mean_confidence,
+            'precision': precision,
+            'calibrationGap': mean_confidence - precision if predicted else None,
+        }
+
+    return {
+        'labelled': labelled,
+        'top1Accuracy': metrics['top1Hits'] / labelled,
+        'top3Accuracy': metrics['top3Hits'] / labelled,
+        'expectedCalibrationError': ece,
+        'calibration': calibration,
+        'characters': characters,
+    }
+
+
+#Stream records through the process pool and write predictions as they finish.
+def run(
+    input_path: str,
+    output_path: str,
+    model_path: str = MODEL_PATH,
+    workers: Optional[int] = None,
+    chunk_size: int = 2000,
+    input_format: Optional[str] = None,
+    id_field: str = 'id',
+    label_field: Optional[str] = 'label',
+) -> Dict[str, Any]:
+    workers = workers or os.cpu_count() or 1
+    # Bound the chunks in flight so memory stays flat regardless of input size.
+    max_in_flight = workers * 2
+    totals = empty_metrics()
+    scored = 0
+    errors = 0
+    started = time.perf_counter()
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(model_path,),
+    ) as pool, open(output_path, 'w', encoding='utf-8') as out:
+        pending = deque()
+
+        def drain_one():
+            nonlocal scored, errors
+            result = pending.popleft().result()
+            if result['lines']:
+                out.write('\n'.join(result['lines']) + '\n')
+            merge_metrics(totals, result['metrics'])
+            scored += len(result['lines'])
+            errors += result['errors']
+
+        for chunk in iter_record_chunks(input_path, chunk_size, input_format):
+            pending.append(pool.submit(score_chunk, chunk, id_field, label_field))
+            if len(pending) >= max_in_flight:
+                drain_one()
+        while pending:
+            drain_one()
+
+    elapsed = time.perf_counter() - started
+    return {
+        'records': scored,
+        'errors': errors,
+        'seconds': round(elapsed, 3),
+        'recordsPerSecond': round(scored / elapsed, 1) if elapsed > 0 else None,
+        'evaluation': build_report(totals),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Bulk-score questionnaire submissions offline.')
+    parser.add_argument('input', help='JSONL, CSV or Parquet file of answer records')
+    parser.add_argument('-o', '--output', required=True, help='JSONL file to write predictions to')
+    parser.add_argument('--model', default=MODEL_PATH, help='Path to the trained model pickle')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    parser.add_argument('--chunk-size', type=int, default=2000, help='Records per chunk')
+    parser.add_argument('--format', choices=['jsonl', 'csv', 'parquet'], default=None,
+                        help='Input format (default: from file extension)')
+    parser.add_argument('--id-field', default='id', help='Record field copied into each prediction')
+    parser.add_argument('--label-field', default='label',
+                        help='Field holding the true character name, used for evaluation')
+    parser.add_argument('--report', default=None, help='Also write the summary/evaluation JSON here')
+    args = parser.parse_args(argv)
+
+    summary = run(
+        args.input,
+        args.output,
+        model_path=args.model,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        input_format=args.format,
+        id_field=args.id_field,
+        label_field=args.label_field or None,
+    )
+    report = json.dumps(summary, indent=2)
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            f.write(report + '\n')
+    print(report)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
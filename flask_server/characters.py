@@ -0,0 +1,146 @@
+"""Server-side registry of inner character profiles.
+
+Loads assets/data/inner_characters_data.json once, validates it (including
+the Arabic *Ar fields) and precompiles one persona prompt per character and
+locale, so /chat requests only need to carry a characterId and a locale.
+
+The JSON lives in the Flutter app's assets, outside flask_server/. Deploy the
+server with the repository's assets/data directory alongside it, or point
+ANA_CHARACTERS_PATH at a copy of the file. Without it, /chat only serves
+requests that include a characterProfile.
+"""
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+CHARACTERS_PATH = os.getenv(
+    'ANA_CHARACTERS_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'assets', 'data', 'inner_characters_data.json'),
+)
+DEFAULT_LOCALE = 'en'
+SUPPORTED_LOCALES = ('en', 'ar')
+
+# Fields that have an Arabic counterpart named '<field>Ar'.
+LOCALIZED_TEXT_FIELDS = ['displayName', 'shortDescription', 'whyIExist', 'coreBelief', 'intention', 'fear']
+LOCALIZED_LIST_FIELDS = ['triggers', 'howIShowUp', 'whatINeed']
+
+
+#Reduce a client locale such as "ar-EG" or "en_US" to a supported locale.
+def normalize_locale(locale: Optional[str]) -> str:
+    language = str(locale or '').replace('_', '-').split('-')[0].lower()
+    return language if language in SUPPORTED_LOCALES else DEFAULT_LOCALE
+
+
+#Build a system prompt for the inner character.
+def build_inner_character_prompt(character_profile: Dict, locale: str = DEFAULT_LOCALE) -> str:
+    display_name = character_profile.get('displayName', 'Inner Part')
+    role = character_profile.get('role', 'Inner Part')
+    short_description = character_profile.get('shortDescription', '')
+    why_i_exist = character_profile.get('whyIExist', '')
+    triggers = character_profile.get('triggers', [])
+    core_belief = character_profile.get('coreBelief', '')
+    intention = character_profile.get('intention', '')
+    fear = character_profile.get('fear', '')
+    what_i_need = character_profile.get('whatINeed', [])
+    language_guideline = ''
+    if normalize_locale(locale) == 'ar':
+        language_guideline = '\n- Always reply in Arabic.'
+
+    return f"""
+You are {display_name}, an inner part in an IFS-style healing conversation.
+You are not a therapist or a doctor. You speak as a real inner part of the user.
+
+Role: {role}
+Short description: {short_description}
+Why I exist: {why_i_exist}
+Triggers: {', '.join(triggers)}
+Core belief: {core_belief}
+Intention: {intention}
+Fear: {fear}
+What I need: {', '.join(what_i_need)}
+
+Guidelines:
+- Stay in-character as {display_name}.
+- Keep responses grounded, compassionate, and healing-focused.
+- Use gentle questions to help the user connect with this part.
+- Avoid clinical language and avoid giving medical advice.
+- Keep the tone realistic and human, not robotic.{language_guideline}
+""".strip()
+
+
+#Pick the fields for one locale, falling back to English where a translation is empty.
+def localize_profile(raw: Dict[str, Any], locale: str) -> Dict[str, Any]:
+    profile = {'id': raw['id'], 'role': raw['role']}
+    for field in LOCALIZED_TEXT_FIELDS + LOCALIZED_LIST_FIELDS:
+        value = raw.get(field)
+        if locale == 'ar' and raw.get(f'{field}Ar'):
+            value = raw[f'{field}Ar']
+        profile[field] = value
+    return profile
+
+
+#Collect validation problems for one raw character entry.
+def validate_character(raw: Any, index: int) -> List[str]:
+    if not isinstance(raw, dict):
+        return [f'entry {index}: expected an object']
+    label = raw.get('id') or f'entry {index}'
+    errors = []
+    for field in ['id', 'role'] + LOCALIZED_TEXT_FIELDS:
+        if not isinstance(raw.get(field), str) or not raw[field].strip():
+            errors.append(f'{label}: "{field}" must be a non-empty string')
+    for field in LOCALIZED_TEXT_FIELDS:
+        if not isinstance(raw.get(f'{field}Ar', ''), str):
+            errors.append(f'{label}: "{field}Ar" must be a string')
+    for field in LOCALIZED_LIST_FIELDS:
+        for name in (field, f'{field}Ar'):
+            value = raw.get(name, [])
+            if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+                errors.append(f'{label}: "{name}" must be a list of strings')
+    return errors
+
+
+class CharacterRegistry:
+    """Validated character profiles and precompiled persona prompts, keyed by id and locale."""
+
+    def __init__(self, path: str = CHARACTERS_PATH):
+        with open(path, 'r', encoding='utf-8') as f:
+            entries = json.load(f)
+        if not isinstance(entries, list):
+            raise ValueError(f'{path}: expected a list of characters')
+
+        errors = []
+        seen = set()
+        for index, raw in enumerate(entries):
+            errors.extend(validate_character(raw, index))
+            character_id = raw.get('id') if isinstance(raw, dict) else None
+            if character_id in seen:
+                errors.append(f'{character_id}: duplicate id')
+            seen.add(character_id)
+        if errors:
+            raise ValueError(f'Invalid character data in {path}: ' + '; '.join(errors))
+
+        self._profiles: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._prompts: Dict[str, Dict[str, str]] = {}
+        for raw in entries:
+            self._profiles[raw['id']] = {
+                locale: localize_profile(raw, locale) for locale in SUPPORTED_LOCALES
+            }
+            self._prompts[raw['id']] = {
+                locale: build_inner_character_prompt(profile, locale)
+                for locale, profile in self._profiles[raw['id']].items()
+            }
+        print(f"Character registry loaded with {len(self._profiles)} characters")
+
+    def __contains__(self, character_id: str) -> bool:
+        return character_id in self._profiles
+
+    def ids(self) -> List[str]:
+        return list(self._profiles)
+
+    def get_profile(self, character_id: str, locale: str = DEFAULT_LOCALE) -> Optional[Dict[str, Any]]:
+        profiles = self._profiles.get(character_id)
+        return profiles[normalize_locale(locale)] if profiles else None
+
+    def get_prompt(self, character_id: str, locale: str = DEFAULT_LOCALE) -> Optional[str]:
+        prompts = self._prompts.get(character_id)
+        return prompts[normalize_locale(locale)] if prompts else None
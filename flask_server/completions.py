@@ -0,0 +1,302 @@
+"""Deadline-aware OpenAI chat completions.
+
+Wraps the OpenAI client with a pooled keep-alive HTTP client, per-endpoint
+deadlines, bounded retries with jitter, optional hedged requests (a second
+identical request fired once the first has run longer than the model's
+recent p95 latency, capped to a small share of traffic and skipped when the
+thread pool is saturated) and a fallback to a faster model when the primary model
+uses up its share of the budget. Latency histograms are kept per model.
+
+Point OPENAI_BASE_URL at a local fake server to exercise all of this without
+the real API.
+"""
+import bisect
+import math
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional
+
+import httpx
+import openai
+from openai import OpenAI
+
+OPENAI_FALLBACK_MODEL = os.getenv('OPENAI_FALLBACK_MODEL', 'gpt-4.1-nano')
+
+# Total time budget (seconds) per calling endpoint, including retries and fallback.
+ENDPOINT_DEADLINES = {
+    'agent_step': float(os.getenv('OPENAI_AGENT_DEADLINE', '25')),
+    'memory_summary': float(os.getenv('OPENAI_SUMMARY_DEADLINE', '12')),
+}
+DEFAULT_DEADLINE = float(os.getenv('OPENAI_DEFAULT_DEADLINE', '20'))
+
+# Share of the deadline the primary model gets before we switch to the fallback.
+PRIMARY_BUDGET_SHARE = 0.6
+MAX_RETRIES = int(os.getenv('OPENAI_MAX_RETRIES', '2'))
+RETRY_BACKOFF_BASE = 0.25
+HEDGE_ENABLED = os.getenv('OPENAI_HEDGE', '1') not in ('0', 'false', 'False')
+HEDGE_PERCENTILE = 95
+HEDGE_MIN_SAMPLES = 20
+# At most this share of recent primary calls may be hedged.
+HEDGE_MAX_RATIO = float(os.getenv('OPENAI_HEDGE_MAX_RATIO', '0.1'))
+HEDGE_WINDOW_SECONDS = 60.0
+CONNECT_TIMEOUT = 5.0
+MAX_CONNECTIONS = int(os.getenv('OPENAI_MAX_CONNECTIONS', '32'))
+
+RETRYABLE_ERRORS = (
+    openai.APIConnectionError,  # includes APITimeoutError
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+
+class CompletionDeadlineExceeded(Exception):
+    """Raised when no completion finished inside the endpoint deadline."""
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram plus a window of recent samples for percentiles."""
+
+    BUCKETS = (0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 32.0, math.inf)
+
+    def __init__(self, window: int = 500):
+        self._lock = threading.Lock()
+        self._counts = [0] * len(self.BUCKETS)
+        self._recent = deque(maxlen=window)
+        self._count = 0
+        self._total = 0.0
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self._counts[bisect.bisect_left(self.BUCKETS, seconds)] += 1
+            self._recent.append(seconds)
+            self._count += 1
+            self._total += seconds
+
+    def percentile(self, pct: float, min_samples: int = 1) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._recent)
+        if len(samples) < max(min_samples, 1):
+            return None
+        rank = min(len(samples) - 1, max(0, math.ceil(pct / 100 * len(samples)) - 1))
+        return samples[rank]
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = list(self._counts)
+            count = self._count
+            total = self._total
+        return {
+            'count': count,
+            'meanSeconds': total / count if count else None,
+            'p50Seconds': self.percentile(50),
+            'p95Seconds': self.percentile(95),
+            'p99Seconds': self.percentile(99),
+            'buckets': {
+                ('+Inf' if math.isinf(bound) else f'le_{bound:g}'): n
+                for bound, n in zip(self.BUCKETS, counts)
+            },
+        }
+
+
+class CompletionClient:
+    """Thread-safe chat completion layer shared by the Flask request threads."""
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        fallback_model: Optional[str] = OPENAI_FALLBACK_MODEL,
+        max_retries: int = MAX_RETRIES,
+        hedge: bool = HEDGE_ENABLED,
+        max_connections: int = MAX_CONNECTIONS,
+    ):
+        self.http_client = httpx.Client(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=60.0,
+            ),
+            timeout=httpx.Timeout(DEFAULT_DEADLINE, connect=CONNECT_TIMEOUT),
+        )
+        # Retries are handled here so they can respect the endpoint deadline.
+        self.client = OpenAI(
+            api_key=api_key,
+            base_url=base_url or os.getenv('OPENAI_BASE_URL') or None,
+            http_client=self.http_client,
+            max_retries=0,
+        )
+        self.fallback_model = fallback_model or None
+        self.max_retries = max_retries
+        self.hedge = hedge
+        # Callers block on these threads, so at most two per in-flight request.
+        self.max_workers = max_connections
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_connections,
+            thread_name_prefix='openai-completion',
+        )
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._recent_calls = deque()
+        self._recent_hedges = deque()
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self._counters: Dict[str, Dict[str, int]] = {}
+
+    def create(
+        self,
+        endpoint: str,
+        model: str,
+        messages: List[Dict[str, str]],
+        deadline: Optional[float] = None,
+        **kwargs,
+    ):
+        """Run a chat completion for ``endpoint`` within its deadline."""
+        budget = deadline if deadline is not None else ENDPOINT_DEADLINES.get(endpoint, DEFAULT_DEADLINE)
+        started = time.monotonic()
+        final_deadline = started + budget
+        use_fallback = bool(self.fallback_model) and self.fallback_model != model
+        primary_deadline = started + budget * PRIMARY_BUDGET_SHARE if use_fallback else final_deadline
+
+        try:
+            return self._create_with_retries(model, messages, kwargs, primary_deadline)
+        except (CompletionDeadlineExceeded,) + RETRYABLE_ERRORS as e:
+            if not use_fallback or time.monotonic() >= final_deadline:
+                raise
+            print(f"[completions] {endpoint}: {model} failed ({type(e).__name__}), falling back to {self.fallback_model}")
+            self._count(model, 'fallbacks')
+            return self._create_with_retries(self.fallback_model, messages, kwargs, final_deadline)
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            models = sorted(set(self._histograms) | set(self._counters))
+            counters = {m: dict(c) for m, c in self._counters.items()}
+        return {
+            model: {
+                'latency': self._histogram(model).snapshot(),
+                **counters.get(model, {}),
+            }
+            for model in models
+        }
+
+    def _create_with_retries(self, model, messages, kwargs, deadline):
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            if time.monotonic() >= deadline:
+                break
+            try:
+                return self._hedged_call(model, messages, kwargs, deadline)
+            except RETRYABLE_ERRORS as e:
+                last_error = e
+                remaining = deadline - time.monotonic()
+                if attempt == self.max_retries or remaining <= 0:
+                    break
+                self._count(model, 'retries')
+                # Full jitter, never sleeping past the deadline.
+                time.sleep(min(random.uniform(0, RETRY_BACKOFF_BASE * 2 ** attempt), remaining))
+        if last_error is not None and time.monotonic() < deadline:
+            raise last_error
+        self._count(model, 'deadlineExceeded')
+        raise CompletionDeadlineExceeded(f'{model} did not complete within its deadline') from last_error
+
+    def _hedged_call(self, model, messages, kwargs, deadline):
+        futures = [self._submit(model, messages, kwargs, deadline, hedge=False)]
+
+        hedge_delay = self._hedge_delay(model)
+        if hedge_delay is not None and time.monotonic() + hedge_delay < deadline:
+            done, _ = wait(futures, timeout=hedge_delay)
+            if not done:
+                if self._take_hedge_slot():
+                    self._count(model, 'hedges')
+                    futures.append(self._submit(model, messages, kwargs, deadline, hedge=True))
+                else:
+                    self._count(model, 'hedgesSkipped')
+
+        pending = set(futures)
+        last_error = None
+        try:
+            while pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+                for future in done:
+                    error = future.exception()
+                    if error is None:
+                        return future.result()
+                    last_error = error
+        finally:
+            # Drop losers that have not started yet; running ones end at the deadline.
+            for future in pending:
+                future.cancel()
+        if last_error is not None and not pending:
+            raise last_error
+        self._count(model, 'deadlineExceeded')
+        raise CompletionDeadlineExceeded(f'{model} did not complete within its deadline')
+
+    def _submit(self, model, messages, kwargs, deadline, hedge: bool):
+        now = time.monotonic()
+        with self._lock:
+            self._in_flight += 1
+            if not hedge:
+                self._recent_calls.append(now)
+                self._prune_hedge_windows(now)
+        future = self._executor.submit(self._call, model, messages, kwargs, deadline)
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, _future) -> None:
+        with self._lock:
+            self._in_flight -= 1
+
+    def _take_hedge_slot(self) -> bool:
+        """Allow a hedge only while the pool has spare threads and the hedge rate is under its cap."""
+        now = time.monotonic()
+        with self._lock:
+            if self._in_flight >= self.max_workers:
+                return False
+            self._prune_hedge_windows(now)
+            if len(self._recent_hedges) + 1 > HEDGE_MAX_RATIO * len(self._recent_calls):
+                return False
+            self._recent_hedges.append(now)
+            return True
+
+    def _prune_hedge_windows(self, now: float) -> None:
+        for window in (self._recent_calls, self._recent_hedges):
+            while window and now - window[0] > HEDGE_WINDOW_SECONDS:
+                window.popleft()
+
+    def _call(self, model, messages, kwargs, deadline):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise CompletionDeadlineExceeded(f'{model} did not start before its deadline')
+        self._count(model, 'requests')
+        started = time.perf_counter()
+        try:
+            response = self.client.with_options(
+                timeout=httpx.Timeout(remaining, connect=min(CONNECT_TIMEOUT, remaining)),
+            ).chat.completions.create(model=model, messages=messages, **kwargs)
+        except Exception:
+            self._count(model, 'errors')
+            raise
+        self._histogram(model).observe(time.perf_counter() - started)
+        return response
+
+    def _hedge_delay(self, model) -> Optional[float]:
+        if not self.hedge:
+            return None
+        return self._histogram(model).percentile(HEDGE_PERCENTILE, min_samples=HEDGE_MIN_SAMPLES)
+
+    def _histogram(self, model) -> LatencyHistogram:
+        with self._lock:
+            histogram = self._histograms.get(model)
+            if histogram is None:
+                histogram = self._histograms[model] = LatencyHistogram()
+            return histogram
+
+    def _count(self, model, name) -> None:
+        with self._lock:
+            counters = self._counters.setdefault(model, {})
+            counters[name] = counters.get(name, 0) + 1
@@ -0,0 +1,230 @@
+"""Per-user, per-character episodic memory with local embeddings.
+
+Each chat turn leaves a short snippet. Snippets are embedded locally with a
+hashing vectorizer (no external service) into a compact NumPy matrix that
+supports incremental appends, oldest-first eviction and top-k cosine search.
+Only the few most relevant snippets that fit a fixed token budget are
+recalled into the prompt, next to the rolling memory summary.
+
+The snippet texts travel with the agent_memory document in Firestore;
+embeddings are recomputed from them whenever the cached index is stale.
+"""
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from sklearn.feature_extraction.text import HashingVectorizer
+
+EMBEDDING_DIM = 512
+MAX_EPISODES = int(os.getenv('ANA_MAX_EPISODES', '200'))
+INDEX_CACHE_SIZE = int(os.getenv('ANA_EPISODE_CACHE_SIZE', '128'))
+RECALL_TOP_K = 4
+RECALL_TOKEN_BUDGET = int(os.getenv('ANA_RECALL_TOKEN_BUDGET', '250'))
+RECALL_MIN_SCORE = 0.15
+SNIPPET_MAX_CHARS = 400
+
+
+#Rough token count used for the recall budget (about four characters per token).
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+#Get the most recent user message, used as the recall query.
+def latest_user_message(messages: List[Dict[str, str]]) -> str:
+    for message in reversed(messages):
+        if message.get('role') == 'user' and message.get('content'):
+            return message['content']
+    return ''
+
+
+#Normalise a user message into the key stored on its episode.
+def user_message_key(content: str) -> str:
+    return ' '.join(str(content or '').split())[:SNIPPET_MAX_CHARS]
+
+
+#Turn the latest exchange into a memory snippet.
+def build_episode_text(messages: List[Dict[str, str]], assistant_message: str) -> str:
+    user_message = latest_user_message(messages)
+    if not user_message:
+        return ''
+    text = f"User: {user_message.strip()}"
+    if assistant_message:
+        text += f"\nPart: {assistant_message.strip()}"
+    if len(text) > SNIPPET_MAX_CHARS:
+        text = text[:SNIPPET_MAX_CHARS - 3].rstrip() + '...'
+    return text
+
+
+class HashingEmbedder:
+    """Stateless word and bigram hashing embeddings, L2-normalised."""
+
+    def __init__(self, dim: int = EMBEDDING_DIM):
+        self.dim = dim
+        self._vectorizer = HashingVectorizer(
+            n_features=dim,
+            ngram_range=(1, 2),
+            alternate_sign=True,
+            norm='l2',
+        )
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return self._vectorizer.transform(texts).toarray().astype(np.float32)
+
+
+class EpisodicMemoryIndex:
+    """Fixed-capacity top-k similarity index over memory snippets, oldest first."""
+
+    def __init__(self, embedder: HashingEmbedder, capacity: int = MAX_EPISODES):
+        self.embedder = embedder
+        self.capacity = capacity
+        self.version: Optional[str] = None
+        self._lock = threading.Lock()
+        self._vectors = np.zeros((min(capacity, 16), embedder.dim), dtype=np.float32)
+        self._records: List[Dict[str, Any]] = []
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def extend(self, records: List[Dict[str, Any]]) -> None:
+        records = [r for r in records if r.get('text')][-self.capacity:]
+        if not records:
+            return
+        vectors = self.embedder.embed([r['text'] for r in records])
+        with self._lock:
+            self._make_room(len(records))
+            start = len(self._records)
+            self._vectors[start:start + len(records)] = vectors
+            self._records.extend(records)
+
+    def append(self, text: str, user_message: str = '') -> None:
+        self.extend([{
+            'text': text,
+            'userMessage': user_message_key(user_message),
+            'createdAt': time.time(),
+        }])
+
+    def search(
+        self,
+        query: str,
+        k: int = RECALL_TOP_K,
+        token_budget: int = RECALL_TOKEN_BUDGET,
+        recent_messages: Optional[List[Dict[str, str]]] = None,
+        min_score: float = RECALL_MIN_SCORE,
+    ) -> List[str]:
+        """Top-k snippets for ``query``, skipping turns already present in ``recent_messages``."""
+        if not query:
+            return []
+        # Those turns are in the prompt verbatim, so recalling them adds nothing.
+        seen = {
+            user_message_key(message.get('content'))
+            for message in recent_messages or []
+            if message.get('role') == 'user' and message.get('content')
+        }
+        query_vector = self.embedder.embed([query])[0]
+        with self._lock:
+            searchable = np.array(
+                [record.get('userMessage') not in seen for record in self._records],
+                dtype=bool,
+            )
+            if not searchable.any():
+                return []
+            rows = np.flatnonzero(searchable)
+            scores = self._vectors[rows] @ query_vector
+            top = min(k, len(rows))
+            candidates = np.argpartition(-scores, top - 1)[:top]
+            candidates = candidates[np.argsort(-scores[candidates])]
+            texts = [self._records[rows[i]]['text'] for i in candidates if scores[i] >= min_score]
+
+        recalled = []
+        used = 0
+        for text in texts:
+            cost = estimate_tokens(text)
+            if used + cost > token_budget:
+                continue
+            recalled.append(text)
+            used += cost
+        return recalled
+
+    def records(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._records)
+
+    def _make_room(self, incoming: int) -> None:
+        needed = len(self._records) + incoming
+        if needed > len(self._vectors) and len(self._vectors) < self.capacity:
+            # Grow geometrically so appends stay amortised O(1).
+            rows = min(self.capacity, max(needed, len(self._vectors) * 2))
+            grown = np.zeros((rows, self.embedder.dim), dtype=np.float32)
+            grown[:len(self._records)] = self._vectors[:len(self._records)]
+            self._vectors = grown
+        overflow = needed - self.capacity
+        if overflow <= 0:
+            return
+        # Evict the oldest snippets and shift the rest down.
+        keep = len(self._records) - overflow
+        self._vectors[:keep] = self._vectors[overflow:len(self._records)]
+        del self._records[:overflow]
+
+
+class EpisodicMemoryStore:
+    """LRU cache of per-user, per-character indexes, rebuilt from stored snippets when stale."""
+
+    def __init__(
+        self,
+        embedder: Optional[HashingEmbedder] = None,
+        capacity: int = MAX_EPISODES,
+        cache_size: int = INDEX_CACHE_SIZE,
+    ):
+        self.embedder = embedder or HashingEmbedder()
+        self.capacity = capacity
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        self._indexes: "OrderedDict[Tuple[str, str], EpisodicMemoryIndex]" = OrderedDict()
+
+    def get_index(self, uid: str, character_id: str, memory: Dict[str, Any]) -> EpisodicMemoryIndex:
+        """Return the index for a memory document loaded from Firestore."""
+        key = (uid, character_id)
+        version = memory.get('episodesVersion')
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is not None and index.version == version:
+                self._indexes.move_to_end(key)
+                return index
+
+        index = EpisodicMemoryIndex(self.embedder, self.capacity)
+        index.extend(memory.get('episodes') or [])
+        index.version = version
+        self._remember(key, index)
+        return index
+
+    def record_turn(
+        self,
+        uid: str,
+        character_id: str,
+        index: EpisodicMemoryIndex,
+        messages: List[Dict[str, str]],
+        assistant_message: str,
+    ) -> Dict[str, Any]:
+        """Append a snippet for this turn and return the fields to save on the memory document."""
+        text = build_episode_text(messages, assistant_message)
+        if text:
+            index.append(text, latest_user_message(messages))
+        index.version = uuid.uuid4().hex
+        self._remember((uid, character_id), index)
+        return {
+            'episodes': index.records(),
+            'episodesVersion': index.version,
+        }
+
+    def _remember(self, key: Tuple[str, str], index: EpisodicMemoryIndex) -> None:
+        with self._lock:
+            self._indexes[key] = index
+            self._indexes.move_to_end(key)
+            while len(self._indexes) > self.cache_size:
+                self._indexes.popitem(last=False)
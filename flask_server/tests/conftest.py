@@ -0,0 +1,81 @@
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    """Local stand-in for the chat completions API with scripted per-model behaviour."""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), _FakeOpenAIHandler)
+        self.lock = threading.Lock()
+        # model -> queue of (status, delay_seconds); empty queue means 200 after 10ms.
+        self.script = defaultdict(deque)
+        self.calls = defaultdict(int)
+
+    @property
+    def base_url(self) -> str:
+        return f'http://127.0.0.1:{self.server_address[1]}/v1'
+
+    def next_action(self, model):
+        with self.lock:
+            self.calls[model] += 1
+            queue = self.script[model]
+            return queue.popleft() if queue else (200, 0.01)
+
+
+class _FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        model = body['model']
+        status, delay = self.server.next_action(model)
+        time.sleep(delay)
+        if status == 200:
+            payload = {
+                'id': 'chatcmpl-fake',
+                'object': 'chat.completion',
+                'created': 0,
+                'model': model,
+                'choices': [{
+                    'index': 0,
+                    'finish_reason': 'stop',
+                    'message': {'role': 'assistant', 'content': f'reply from {model}'},
+                }],
+            }
+        else:
+            payload = {'error': {'message': 'fake failure', 'type': 'server_error'}}
+        data = json.dumps(payload).encode()
+        try:
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up on this request (deadline or hedge loser).
+            pass
+
+
+@pytest.fixture
+def fake_openai():
+    server = FakeOpenAIServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
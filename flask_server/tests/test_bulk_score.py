@@ -0,0 +1,173 @@
+import json
+import pickle
+import random
+
+import numpy as np
+import pytest
+from sklearn.linear_model import LogisticRegression
+from sklearn.preprocessing import StandardScaler
+
+import bulk_score
+from bulk_score import build_report, empty_metrics, iter_record_chunks, merge_metrics, score_chunk
+from predictor import AIPredictor, REQUIRED_QUESTIONS
+
+CHARACTERS = ['Perfectionist', 'Inner Critic', 'Lonely Part', 'Procrastinator', 'People Pleaser']
+SLIDER_VALUES = ['0-20%', '21-50%', '51-80%', '81-100%']
+
+
+def make_answers(rng):
+    answers = {}
+    for q in REQUIRED_QUESTIONS:
+        if q in ('Q2', 'Q4', 'Q8'):
+            answers[q] = rng.choice(SLIDER_VALUES)
+        else:
+            options = {str(rng.randint(0, 5)) for _ in range(rng.randint(1, 3))}
+            answers[q] = ','.join(sorted(options))
+    return answers
+
+
+@pytest.fixture(scope='module')
+def model_path(tmp_path_factory):
+    rng = random.Random(0)
+    features = AIPredictor.__new__(AIPredictor)._create_features([make_answers(rng) for _ in range(200)])
+    columns = list(features.columns)
+    labels = [i % len(CHARACTERS) for i in range(len(features))]
+    scaler = StandardScaler().fit(features[columns])
+    model = LogisticRegression(max_iter=500).fit(scaler.transform(features[columns]), labels)
+
+    path = tmp_path_factory.mktemp('model') / 'predictor.pkl'
+    with open(path, 'wb') as f:
+        pickle.dump({
+            'model': model,
+            'scaler': scaler,
+            'pattern_models': {},
+            'pattern_scalers': {},
+            'feature_columns': columns,
+            'char_to_idx': {name: i for i, name in enumerate(CHARACTERS)},
+            'idx_to_char': dict(enumerate(CHARACTERS)),
+            'pattern_distribution': {},
+        }, f)
+    return str(path)
+
+
+@pytest.fixture
+def worker(model_path, monkeypatch):
+    predictor = AIPredictor(model_path, verbose=False)
+    monkeypatch.setattr(bulk_score, '_worker_predictor', predictor)
+    return predictor
+
+
+class FixedPredictor:
+    """Returns the probabilities stored on each record, for hand-checked metrics."""
+
+    idx_to_char = {0: 'A', 1: 'B', 2: 'C', 3: 'D'}
+
+    def predict_proba_batch(self, answers_batch):
+        return np.array([answers['probs'] for answers in answers_batch])
+
+
+def labelled(probs, label):
+    answers = {q: '0' for q in REQUIRED_QUESTIONS}
+    answers['probs'] = probs
+    return {'answers': answers, 'label': label}
+
+
+def test_batch_matches_single_record_predictions(worker):
+    rng = random.Random(1)
+    batch = [make_answers(rng) for _ in range(12)]
+    batch[3]['Q5'] = None
+
+    probabilities = worker.predict_proba_batch(batch)
+
+    for row, answers in zip(probabilities, batch):
+        np.testing.assert_allclose(row, worker.predict_proba_batch([answers])[0])
+        single = worker.predict(answers)['predictions']
+        expected = [float(row[i]) for i in np.argsort(row)[-3:][::-1]]
+        assert [p['confidence'] for p in single] == pytest.approx(expected)
+
+
+def test_bad_record_only_fails_itself(worker):
+    rng = random.Random(2)
+    records = [{'id': i, 'answers': make_answers(rng), 'label': CHARACTERS[i]} for i in range(5)]
+    bad = {'id': 'bad', 'answers': dict(make_answers(rng), Q1=['0', '2']), 'label': CHARACTERS[0]}
+
+    alone = score_chunk(records, 'id', 'label')
+    result = score_chunk(records[:2] + [bad] + records[2:], 'id', 'label')
+
+    lines = [json.loads(line) for line in result['lines']]
+    assert [line['id'] for line in lines] == [0, 1, 'bad', 2, 3, 4]
+    assert [line['success'] for line in lines] == [True, True, False, True, True, True]
+    assert result['errors'] == 1
+    # The fallback scores records one by one, so sums may differ in the last bits.
+    for key in ('labelled', 'top1Hits', 'top3Hits', 'binCounts', 'binCorrect'):
+        assert result['metrics'][key] == alone['metrics'][key]
+    assert result['metrics']['binConfidenceSum'] == pytest.approx(alone['metrics']['binConfidenceSum'])
+    for line, expected in zip([line for line in lines if line['success']], alone['lines']):
+        expected = json.loads(expected)['predictions']
+        assert [p['characterName'] for p in line['predictions']] == [p['characterName'] for p in expected]
+        assert [p['confidence'] for p in line['predictions']] == pytest.approx([p['confidence'] for p in expected])
+
+
+def test_missing_answers_are_rejected_and_not_scored(worker):
+    rng = random.Random(3)
+    complete = {'id': 'ok', 'answers': make_answers(rng), 'label': CHARACTERS[0]}
+    partial = {'id': 'partial', 'answers': {'Q1': '0,2', 'Q2': '81-100%'}, 'label': CHARACTERS[1]}
+
+    result = score_chunk([complete, partial], 'id', 'label')
+
+    lines = [json.loads(line) for line in result['lines']]
+    assert lines[0]['success'] is True
+    assert lines[1] == {
+        'id': 'partial',
+        'success': False,
+        'error': 'Missing answers for: ' + ', '.join(REQUIRED_QUESTIONS[2:]),
+    }
+    assert result['errors'] == 1
+    assert result['metrics']['labelled'] == 1
+    assert result['metrics'] == score_chunk([complete], 'id', 'label')['metrics']
+
+
+def test_report_from_merged_chunks(monkeypatch):
+    monkeypatch.setattr(bulk_score, '_worker_predictor', FixedPredictor())
+    chunks = [
+        [labelled([0.9, 0.05, 0.03, 0.02], 'A'), labelled([0.7, 0.2, 0.06, 0.04], 'B')],
+        [labelled([0.1, 0.75, 0.1, 0.05], 'B'), labelled([0.04, 0.06, 0.3, 0.6], 'A')],
+    ]
+    metrics = empty_metrics()
+    for chunk in chunks:
+        merge_metrics(metrics, score_chunk(chunk, 'id', 'label')['metrics'])
+
+    report = build_report(metrics)
+
+    assert report['labelled'] == 4
+    assert report['top1Accuracy'] == 0.5
+    assert report['top3Accuracy'] == 0.75
+    # Bins 0.6 (1 miss at 0.6), 0.7 (1 of 2 at mean 0.725) and 0.9 (1 hit at 0.9).
+    assert [b['count'] for b in report['calibration']] == [1, 2, 1]
+    assert report['expectedCalibrationError'] == pytest.approx(0.25 * 0.6 + 0.5 * 0.225 + 0.25 * 0.1)
+
+    characters = report['characters']
+    assert characters['A']['support'] == 2
+    assert characters['A']['top1Accuracy'] == 0.5
+    assert characters['A']['precision'] == 0.5
+    assert characters['A']['meanConfidence'] == pytest.approx(0.8)
+    assert characters['A']['calibrationGap'] == pytest.approx(0.3)
+    assert characters['B']['top3Accuracy'] == 1.0
+    assert characters['B']['precision'] == 1.0
+    assert characters['B']['calibrationGap'] == pytest.approx(-0.25)
+    assert characters['D']['support'] == 0
+    assert characters['D']['top1Accuracy'] is None
+    assert characters['D']['precision'] == 0.0
+    assert characters['D']['calibrationGap'] == pytest.approx(0.6)
+
+
+def test_csv_blank_cells_are_none(tmp_path):
+    path = tmp_path / 'answers.csv'
+    path.write_text('id,Q1,Q2,Q5\n1,"0,2",81-100%,\n2,3,,1\n3,1,0-20%,2\n')
+
+    chunks = list(iter_record_chunks(str(path), chunk_size=2))
+
+    assert [len(chunk) for chunk in chunks] == [2, 1]
+    first, second = chunks[0]
+    assert first == {'id': '1', 'Q1': '0,2', 'Q2': '81-100%', 'Q5': None}
+    assert second['Q2'] is None
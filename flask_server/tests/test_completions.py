@@ -0,0 +1,102 @@
+import time
+
+import openai
+import pytest
+
+import completions
+from completions import CompletionClient, CompletionDeadlineExceeded, HEDGE_MIN_SAMPLES
+
+MESSAGES = [{'role': 'user', 'content': 'hi'}]
+
+
+def make_client(fake_openai, **kwargs):
+    kwargs.setdefault('fallback_model', 'fast')
+    return CompletionClient(api_key='test', base_url=fake_openai.base_url, **kwargs)
+
+
+def reply(response):
+    return response.choices[0].message.content
+
+
+def test_timeout_falls_back_to_faster_model(fake_openai):
+    fake_openai.script['primary'].append((200, 3.0))
+    client = make_client(fake_openai, max_retries=0, hedge=False)
+
+    started = time.monotonic()
+    response = client.create('agent_step', 'primary', MESSAGES, deadline=1.0)
+
+    assert reply(response) == 'reply from fast'
+    assert time.monotonic() - started < 1.0
+    metrics = client.metrics()
+    assert metrics['primary']['fallbacks'] == 1
+    assert metrics['primary']['deadlineExceeded'] == 1
+
+
+def test_server_errors_are_retried_then_fall_back(fake_openai):
+    fake_openai.script['primary'].extend([(500, 0), (500, 0), (500, 0)])
+    client = make_client(fake_openai, max_retries=2, hedge=False)
+
+    response = client.create('agent_step', 'primary', MESSAGES, deadline=5.0)
+
+    assert reply(response) == 'reply from fast'
+    assert fake_openai.calls['primary'] == 3
+    metrics = client.metrics()
+    assert metrics['primary']['retries'] == 2
+    assert metrics['primary']['fallbacks'] == 1
+
+
+def test_retry_recovers_on_primary(fake_openai):
+    fake_openai.script['primary'].append((500, 0))
+    client = make_client(fake_openai, max_retries=2, hedge=False)
+
+    response = client.create('agent_step', 'primary', MESSAGES, deadline=5.0)
+
+    assert reply(response) == 'reply from primary'
+    assert client.metrics()['primary']['retries'] == 1
+
+
+def test_client_errors_are_not_retried(fake_openai):
+    fake_openai.script['primary'].append((400, 0))
+    client = make_client(fake_openai, max_retries=2, hedge=False)
+
+    with pytest.raises(openai.BadRequestError):
+        client.create('agent_step', 'primary', MESSAGES, deadline=5.0)
+    assert fake_openai.calls['primary'] == 1
+
+
+def test_deadline_exceeded_without_fallback(fake_openai):
+    fake_openai.script['primary'].append((200, 2.0))
+    client = make_client(fake_openai, fallback_model=None, max_retries=0, hedge=False)
+
+    with pytest.raises(CompletionDeadlineExceeded):
+        client.create('agent_step', 'primary', MESSAGES, deadline=0.5)
+
+
+def test_slow_call_is_hedged_after_p95(fake_openai):
+    client = make_client(fake_openai, fallback_model=None, hedge=True)
+    for _ in range(HEDGE_MIN_SAMPLES):
+        client.create('agent_step', 'primary', MESSAGES)
+
+    fake_openai.script['primary'].append((200, 3.0))
+    started = time.monotonic()
+    response = client.create('agent_step', 'primary', MESSAGES, deadline=5.0)
+
+    assert reply(response) == 'reply from primary'
+    assert time.monotonic() - started < 1.0
+    assert client.metrics()['primary']['hedges'] == 1
+
+
+def test_hedge_rate_is_capped(fake_openai, monkeypatch):
+    monkeypatch.setattr(completions, 'HEDGE_MAX_RATIO', 0.05)
+    client = make_client(fake_openai, fallback_model=None, hedge=True)
+    for _ in range(HEDGE_MIN_SAMPLES):
+        client.create('agent_step', 'primary', MESSAGES)
+
+    # 21 primary calls allow a single hedge at a 5% cap; the second slow call waits it out.
+    fake_openai.script['primary'].extend([(200, 0.5), (200, 0.01), (200, 0.5)])
+    client.create('agent_step', 'primary', MESSAGES, deadline=5.0)
+    client.create('agent_step', 'primary', MESSAGES, deadline=5.0)
+
+    metrics = client.metrics()['primary']
+    assert metrics['hedges'] == 1
+    assert metrics['hedgesSkipped'] == 1
@@ -0,0 +1,218 @@
+import importlib
+import json
+import re
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from episodic_memory import EpisodicMemoryStore
+
+MESSAGES = [{'role': 'user', 'content': 'I keep putting off my thesis'}]
+
+
+class FakeSnapshot:
+    def __init__(self, doc_id, data):
+        self.id = doc_id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self):
+        return self._data
+
+
+class FakeRef:
+    def __init__(self, db, path):
+        self.db = db
+        self.path = path
+        self.id = path.split('/')[-1]
+
+    def collection(self, name):
+        return FakeRef(self.db, f'{self.path}/{name}')
+
+    def document(self, name='auto'):
+        return FakeRef(self.db, f'{self.path}/{name}')
+
+    def get(self):
+        return FakeSnapshot(self.id, self.db.docs.get(self.path))
+
+    def set(self, data, merge=False):
+        self.db.docs.setdefault(self.path, {}).update(data)
+
+
+class FakeBatch:
+    def __init__(self, db):
+        self.db = db
+        self.ops = []
+
+    def set(self, ref, data, merge=False):
+        self.ops.append((ref, data))
+
+    def commit(self):
+        if self.db.fail_commit:
+            raise RuntimeError('commit failed')
+        self.db.commits.append([ref.path for ref, _ in self.ops])
+        for ref, data in self.ops:
+            ref.set(data, merge=True)
+
+
+class FakeFirestore:
+    """In-memory stand-in for the Firestore calls the council endpoint makes."""
+
+    def __init__(self):
+        self.docs = {}
+        self.commits = []
+        self.fail_commit = False
+
+    def collection(self, name):
+        return FakeRef(self, name)
+
+    def get_all(self, refs):
+        # Firestore does not promise to return snapshots in request order.
+        return [ref.get() for ref in reversed(list(refs))]
+
+    def batch(self):
+        return FakeBatch(self)
+
+
+class FakeCompletionClient:
+    """Answers agent steps as the part named in the system prompt, echoing its memory summary."""
+
+    def __init__(self):
+        self.delays = {}
+        self.failures = set()
+
+    def create(self, endpoint, model, messages, **kwargs):
+        prompt = messages[0]['content']
+        name = re.search(r'You are (.+?),', prompt).group(1)
+        summary = re.search(r'Memory summary \(use only if relevant\):\n(.*)', prompt)
+        time.sleep(self.delays.get(name, 0))
+        if name in self.failures:
+            raise RuntimeError(f'{name} timed out')
+        content = json.dumps({
+            'assistantMessage': f'{name}: {summary.group(1) if summary else "no memory"}',
+            'toolCalls': [{'name': 'set_last_agent_run', 'args': {}}],
+            'memorySummary': f'{name} summary',
+        })
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+@pytest.fixture(scope='module')
+def app_module():
+    with pytest.MonkeyPatch.context() as mp:
+        import firebase_admin
+        from firebase_admin import firestore
+        mp.setattr(firebase_admin, 'get_app', lambda: None)
+        mp.setattr(firestore, 'client', FakeFirestore)
+        mp.setenv('OPENAI_API_KEY', 'test')
+        yield importlib.import_module('app')
+
+
+@pytest.fixture
+def council(app_module, monkeypatch):
+    monkeypatch.setenv('OPENAI_API_KEY', 'test')
+    db = FakeFirestore()
+    completions = FakeCompletionClient()
+    monkeypatch.setattr(app_module, 'db', db)
+    monkeypatch.setattr(app_module, 'completion_client', completions)
+    monkeypatch.setattr(app_module, 'episodic_store', EpisodicMemoryStore())
+    client = app_module.app.test_client()
+
+    def post(characters, **body):
+        return client.post('/chat/council', json={'uid': 'u1', 'messages': MESSAGES, 'characters': characters, **body})
+
+    return SimpleNamespace(post=post, db=db, completions=completions)
+
+
+def part(character_id):
+    return {'characterId': character_id, 'characterProfile': {'displayName': f'Part {character_id}'}}
+
+
+def test_replies_keep_request_order(council):
+    council.completions.delays = {'Part a': 0.3, 'Part c': 0.15}
+
+    response = council.post([part('a'), part('b'), part('c')])
+
+    assert response.status_code == 200
+    assert [r['characterId'] for r in response.json['replies']] == ['a', 'b', 'c']
+    assert [r['displayName'] for r in response.json['replies']] == ['Part a', 'Part b', 'Part c']
+
+
+def test_memories_map_back_by_snapshot_id(council):
+    council.db.docs['users/u1/agent_memory/a'] = {'summary': 'likes lists'}
+    council.db.docs['users/u1/agent_memory/c'] = {'summary': 'fears deadlines'}
+
+    response = council.post([part('a'), part('b'), part('c')])
+
+    assert [r['assistantMessage'] for r in response.json['replies']] == [
+        'Part a: likes lists',
+        'Part b: no memory',
+        'Part c: fears deadlines',
+    ]
+
+
+def test_failed_part_does_not_fail_council(council):
+    council.completions.failures = {'Part b'}
+
+    response = council.post([part('a'), part('b'), part('c')])
+
+    assert response.status_code == 200
+    assert response.json['success'] is True
+    replies = response.json['replies']
+    assert [r['success'] for r in replies] == [True, False, True]
+    assert replies[1] == {'characterId': 'b', 'displayName': 'Part b', 'success': False, 'error': 'Part b timed out'}
+    assert len(response.json['toolCalls']) == 2
+    assert council.db.docs['users/u1/agent_memory/a']['summary'] == 'Part a summary'
+    assert 'users/u1/agent_memory/b' not in council.db.docs
+    assert len(council.db.commits) == 1
+
+
+def test_all_parts_failing_is_unsuccessful(council):
+    council.completions.failures = {'Part a', 'Part b'}
+
+    response = council.post([part('a'), part('b')])
+
+    assert response.status_code == 200
+    assert response.json['success'] is False
+
+
+def test_commit_failure_still_returns_replies(council):
+    council.db.fail_commit = True
+
+    response = council.post([part('a'), part('b')])
+
+    assert response.status_code == 200
+    assert response.json['success'] is True
+    assert [r['assistantMessage'] for r in response.json['replies']] == ['Part a: no memory', 'Part b: no memory']
+    assert council.db.docs == {}
+
+
+@pytest.mark.parametrize('characters', [['a'], 'a', {'characterId': 'a'}, [part('a'), None]])
+def test_characters_must_be_a_list_of_objects(council, characters):
+    response = council.post(characters)
+
+    assert response.status_code == 400
+    assert response.json == {'success': False, 'error': 'characters must be a list of objects'}
+
+
+def test_empty_and_duplicate_ids_are_skipped(council):
+    response = council.post([{'characterId': ''}, part('a'), {}, part('b'), part('a')])
+
+    assert [r['characterId'] for r in response.json['replies']] == ['a', 'b']
+
+
+def test_no_usable_ids_is_rejected(council):
+    response = council.post([{'characterId': ''}, {}])
+
+    assert response.status_code == 400
+    assert response.json['success'] is False
+
+
+def test_part_count_is_capped(council, app_module, monkeypatch):
+    monkeypatch.setattr(app_module, 'COUNCIL_MAX_PARTS', 2)
+
+    response = council.post([part('a'), part('b'), part('c')])
+
+    assert response.status_code == 400
+    assert response.json['error'] == 'At most 2 characters per council request'
+    assert council.db.commits == []
@@ -0,0 +1,36 @@
+from episodic_memory import EpisodicMemoryStore
+
+
+def turn(user, assistant='I hear you.'):
+    return [{'role': 'user', 'content': user}], assistant
+
+
+def test_recall_skips_only_turns_present_in_request():
+    store = EpisodicMemoryStore(capacity=50)
+    index = store.get_index('u', 'lonely', {})
+    # e.g. a council turn that never appears in this character's chat thread
+    store.record_turn('u', 'lonely', index, *turn('I miss my grandmother every evening'))
+    store.record_turn('u', 'lonely', index, *turn('I miss my grandmother when I cook'))
+
+    thread = [
+        {'role': 'user', 'content': 'I miss my grandmother when I cook'},
+        {'role': 'assistant', 'content': 'I hear you.'},
+        {'role': 'user', 'content': 'Thinking about my grandmother again'},
+    ]
+    recalled = index.search('Thinking about my grandmother again', recent_messages=thread)
+
+    assert recalled == ['User: I miss my grandmother every evening\nPart: I hear you.']
+
+
+def test_episodes_round_trip_and_evict_oldest():
+    store = EpisodicMemoryStore(capacity=3)
+    index = store.get_index('u', 'c', {})
+    fields = {}
+    for i in range(5):
+        fields = store.record_turn('u', 'c', index, *turn(f'message number {i}'))
+
+    rebuilt = EpisodicMemoryStore(capacity=3).get_index('u', 'c', fields)
+
+    assert [r['userMessage'] for r in rebuilt.records()] == [
+        'message number 2', 'message number 3', 'message number 4',
+    ]
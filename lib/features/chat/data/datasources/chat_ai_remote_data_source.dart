@@ -19,8 +19,10 @@ class ChatAiRemoteDataSource {
     required String threadId,
     required String sessionId,
     required String characterId,
-    required Map<String, dynamic> characterProfile,
     required List<Map<String, String>> messages,
+    String locale = 'en',
+    //Only needed for characters the server does not know about.
+    Map<String, dynamic>? characterProfile,
   }) async {
     final uri = Uri.parse('$_baseUrl/chat');
     final response = await _client.post(
@@ -31,7 +33,8 @@ class ChatAiRemoteDataSource {
         'threadId': threadId,
         'sessionId': sessionId,
         'characterId': characterId,
-        'characterProfile': characterProfile,
+        'locale': locale,
+        if (characterProfile != null) 'characterProfile': characterProfile,
         'messages': messages,
       }),
     );
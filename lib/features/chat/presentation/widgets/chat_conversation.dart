@@ -1,6 +1,8 @@
 import 'package:firebase_auth/firebase_auth.dart';
 import 'package:flutter/material.dart';
+import 'package:provider/provider.dart';
 
+import 'package:ana_ifs_app/core/localization/app_language_provider.dart';
 import 'package:ana_ifs_app/features/chat/data/datasources/chat_ai_remote_data_source.dart';
 import 'package:ana_ifs_app/features/chat/data/datasources/chat_remote_data_source.dart';
 import 'package:ana_ifs_app/features/chat/data/datasources/inner_character_local_data_source.dart';
@@ -102,6 +104,7 @@ class _ChatConversationState extends State<ChatConversation> {
     });
 
     _messageController.clear();
+    final locale = context.read<AppLanguageProvider>().language;
 
     try {
       await _chatRemoteDataSource.sendMessage(
@@ -146,7 +149,10 @@ class _ChatConversationState extends State<ChatConversation> {
         threadId: thread.id,
         sessionId: thread.sessionId,
         characterId: widget.characterId,
-        characterProfile: _buildCharacterPrompt(),
+        locale: locale,
+        //Known characters are resolved by the server from their id.
+        characterProfile:
+            _characterProfile == null ? _buildFallbackCharacterPrompt() : null,
         messages: messagePayload,
       );
 
@@ -179,12 +185,8 @@ class _ChatConversationState extends State<ChatConversation> {
     }
   }
 
-  //Build a system prompt for the inner character.
-  Map<String, dynamic> _buildCharacterPrompt() {
-    final profile = _characterProfile;
-    if (profile != null) {
-      return profile.toPromptMap();
-    }
+  //Build a prompt profile for a character missing from the local data.
+  Map<String, dynamic> _buildFallbackCharacterPrompt() {
     return {
       'id': widget.characterId,
       'displayName': widget.fallbackTitle,